@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import io
+from functools import lru_cache
 from pathlib import Path
 
 LANG_CODE = {
@@ -12,7 +14,32 @@ LANG_CODE = {
     "french": "fr",
 }
 
+# Characters that make csv.writer quote a cell with the default dialect.
+QUOTE_CHARS = frozenset(',"\r\n')
+LINE_TERMINATOR = "\r\n"
+WRITE_CHUNK_ROWS = 8192
 
+
+def needs_quoting(row):
+    return any(not QUOTE_CHARS.isdisjoint(cell) for cell in row)
+
+
+def make_row_encoder():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=LINE_TERMINATOR)
+
+    def encode_row(row):
+        if not needs_quoting(row):
+            return (",".join(row) + LINE_TERMINATOR).encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        return buffer.getvalue().encode("utf-8")
+
+    return encode_row
+
+
+@lru_cache(maxsize=64)
 def parse_pair(name):
     stem = name.removesuffix(".csv")
     parts = stem.split("-")
@@ -25,6 +52,14 @@ def parse_pair(name):
     return left, right
 
 
+def english_first(row):
+    return row[0].strip(), row[1].strip()
+
+
+def english_second(row):
+    return row[1].strip(), row[0].strip()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Merge vocabularies into a single CSV.")
     parser.add_argument("input_dir", help="Directory containing vocabulary CSV files")
@@ -35,41 +70,36 @@ def main():
     output_csv = Path(args.output_csv)
 
     english_to = {"ru": {}, "nl": {}, "es": {}, "de": {}, "fr": {}}
-    english_order = []
-    english_seen = set()
+    english_order = {}
 
     for csv_path in sorted(input_dir.glob("*.csv")):
         pair = parse_pair(csv_path.name)
         if not pair:
             continue
         left, right = pair
-        if left != "en" and right != "en":
+        if left == "en":
+            other_lang = right
+            extract = english_first
+        elif right == "en":
+            other_lang = left
+            extract = english_second
+        else:
             continue
+        # Pairs without an output column (english-english) still contribute keys.
+        target_dict = english_to.get(other_lang, {})
         with csv_path.open(newline="", encoding="utf-8") as handle:
-            reader = csv.reader(handle)
+            reader = csv.reader(handle, skipinitialspace=True)
             for row in reader:
                 if len(row) < 2:
                     continue
-                left_word = row[0].strip()
-                right_word = row[1].strip()
-                if not left_word or not right_word:
+                english, other_word = extract(row)
+                if not english or not other_word:
                     continue
 
-                if left == "en":
-                    english = left_word
-                    other_lang = right
-                    other_word = right_word
-                else:
-                    english = right_word
-                    other_lang = left
-                    other_word = left_word
-
-                if english not in english_seen:
-                    english_order.append(english)
-                    english_seen.add(english)
+                if english not in english_order:
+                    english_order[english] = None
 
-                if other_lang in english_to:
-                    english_to[other_lang][english] = other_word
+                target_dict.setdefault(english, other_word)
 
     if not english_order:
         print("No English-keyed vocabularies found.")
@@ -78,18 +108,24 @@ def main():
     output_csv.parent.mkdir(parents=True, exist_ok=True)
     header = ["en", "ru", "nl", "es", "de", "fr"]
     missing_counts = {lang: 0 for lang in header if lang != "en"}
+    lookups = [(lang, english_to[lang].get) for lang in header[1:]]
 
-    with output_csv.open("w", newline="", encoding="utf-8") as handle:
-        writer = csv.writer(handle)
-        writer.writerow(header)
+    encode_row = make_row_encoder()
+    with output_csv.open("wb") as handle:
+        handle.write(encode_row(header))
+        pending = []
         for english in english_order:
             row = [english]
-            for lang in header[1:]:
-                value = english_to[lang].get(english, "")
+            for lang, lookup in lookups:
+                value = lookup(english, "")
                 if value == "":
                     missing_counts[lang] += 1
                 row.append(value)
-            writer.writerow(row)
+            pending.append(encode_row(row))
+            if len(pending) >= WRITE_CHUNK_ROWS:
+                handle.writelines(pending)
+                pending.clear()
+        handle.writelines(pending)
 
     for lang, count in missing_counts.items():
         if count:
@@ -1,34 +1,100 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import http.client
 import json
 import random
+import sqlite3
 import sys
+import threading
 import time
-import urllib.error
+import unicodedata
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 DEEPL_FREE_ENDPOINT = "https://api-free.deepl.com/v2/translate"
-REQUEST_DELAY_SECONDS = 0.3
+MAX_REQUESTS_PER_SECOND = 5
+BATCH_SIZE = 50
+MAX_WORKERS = 5
 MAX_RETRIES = 10
+RETRY_BASE_SECONDS = 0.5
+RETRY_CAP_SECONDS = 30.0
 TIMEOUT_SECONDS = 30
+WRITE_BUFFER_BYTES = 65536
 
 
-def translate(text, source, target, cache, auth_key, endpoint):
-    text = text.strip()
-    if not text:
-        return ""
-    cached = cache.get(text)
-    if cached is not None:
-        return cached
+class RateLimiter:
+    """Token bucket shared by all workers; spaces requests 1/rps apart."""
 
-    payload = {
-        "text": text,
-        "source_lang": source,
-        "target_lang": target,
-    }
+    def __init__(self, rps):
+        self._interval = 1.0 / rps
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class TranslationStore:
+    """SQLite cache of finished translations; every batch is committed as it lands."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "src TEXT, tgt TEXT, text TEXT, tr TEXT, PRIMARY KEY (src, tgt, text))"
+        )
+        self._conn.commit()
+
+    def load(self, source, target):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text, tr FROM translations WHERE src = ? AND tgt = ?", (source, target)
+            )
+            return dict(rows)
+
+    def add(self, source, target, items):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                [(source, target, key, translated) for key, translated in items],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def open_connection(endpoint):
+    parts = urllib.parse.urlsplit(endpoint)
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.netloc, timeout=TIMEOUT_SECONDS)
+    return http.client.HTTPConnection(parts.netloc, timeout=TIMEOUT_SECONDS)
+
+
+def request_translations(connection, path, texts, source, target, auth_key, limiter):
+    payload = [("text", text) for text in texts]
+    payload += [("source_lang", source), ("target_lang", target)]
     data = urllib.parse.urlencode(payload).encode("utf-8")
     headers = {
         "Authorization": f"DeepL-Auth-Key {auth_key}",
@@ -36,35 +102,80 @@ def translate(text, source, target, cache, auth_key, endpoint):
     }
 
     last_error = None
-    for attempt in range(MAX_RETRIES):
+    wait = RETRY_BASE_SECONDS
+    for _ in range(MAX_RETRIES):
+        retry_after = 0.0
+        limiter.acquire()
         try:
-            req = urllib.request.Request(endpoint, data=data, headers=headers, method="POST")
-            with urllib.request.urlopen(req, timeout=TIMEOUT_SECONDS) as response:
-                body = response.read()
-            result = json.loads(body)
-            translations = result.get("translations", [])
-            if not translations:
-                raise RuntimeError(f"empty translation for {source}->{target}: {text}")
-            translated = translations[0].get("text", "")
-            if translated == "":
-                raise RuntimeError(f"empty translation for {source}->{target}: {text}")
-            cache[text] = translated
-            time.sleep(REQUEST_DELAY_SECONDS)
-            return translated
-        except urllib.error.HTTPError as exc:
-            last_error = exc
-            if exc.code == 456:
-                raise RuntimeError("DeepL quota exceeded") from exc
-            if exc.code not in (429, 500, 502, 503, 504):
-                raise
-        except urllib.error.URLError as exc:
+            connection.request("POST", path, body=data, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError) as exc:
             last_error = exc
+            connection.close()
+        else:
+            if response.status == 200:
+                result = json_loads(body)
+                translations = [item.get("text", "") for item in result.get("translations", [])]
+                if len(translations) != len(texts) or "" in translations:
+                    raise RuntimeError(f"empty translation for {source}->{target}: {texts}")
+                return translations
+            last_error = RuntimeError(f"HTTP {response.status}: {body.decode('utf-8', 'replace')}")
+            if response.status == 456:
+                raise RuntimeError("DeepL quota exceeded") from last_error
+            if response.status not in (429, 500, 502, 503, 504):
+                raise last_error
+            if response.status == 429:
+                retry_after = parse_retry_after(response.getheader("Retry-After"))
 
-        wait = (2 ** attempt) + random.random()
+        # Decorrelated jitter keeps concurrent workers from retrying in lockstep.
+        wait = min(RETRY_CAP_SECONDS, random.uniform(RETRY_BASE_SECONDS, wait * 3))
+        wait = max(wait, retry_after)
         print(f"retrying {source}->{target} after error: {last_error}", file=sys.stderr)
         time.sleep(wait)
 
-    raise RuntimeError(f"failed translation for {source}->{target}: {text}") from last_error
+    raise RuntimeError(f"failed translation for {source}->{target}: {texts}") from last_error
+
+
+def cache_key(text):
+    # Case and Unicode-form variants of a word share one translation.
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def translate(texts, source, target, cache, store, auth_key, endpoint, limiter):
+    """Translate texts (cache key -> original text) into cache."""
+    if source == target:
+        cache.update(texts)
+        return
+    pending = [(key, text) for key, text in texts.items() if key not in cache]
+    if not pending:
+        return
+    # One keep-alive connection per worker; http.client connections are not thread-safe.
+    connection = open_connection(endpoint)
+    path = urllib.parse.urlsplit(endpoint).path
+    try:
+        for offset in range(0, len(pending), BATCH_SIZE):
+            batch = pending[offset:offset + BATCH_SIZE]
+            keys = [key for key, _ in batch]
+            batch_texts = [text for _, text in batch]
+            translations = request_translations(connection, path, batch_texts, source, target, auth_key, limiter)
+            store.add(source, target, zip(keys, translations))
+            cache.update(zip(keys, translations))
+            print(f"translated {offset + len(batch)}/{len(pending)} {source}->{target}")
+    finally:
+        connection.close()
+
+
+def read_pairs(input_path):
+    with input_path.open(newline="", encoding="utf-8") as handle:
+        for row in csv.reader(handle):
+            if len(row) < 2:
+                continue
+            dutch = row[0].strip()
+            english = row[1].strip()
+            if not dutch or not english:
+                continue
+            yield dutch, english
 
 
 def main():
@@ -90,58 +201,69 @@ def main():
         "french_russian": output_dir / "french-russian.csv",
     }
 
-    caches = {
-        "nl_ru": {},
-        "en_ru": {},
-        "en_es": {},
-        "en_de": {},
-        "en_fr": {},
+    pairs = {
+        "nl_ru": ("NL", "RU"),
+        "en_ru": ("EN", "RU"),
+        "en_es": ("EN", "ES"),
+        "en_de": ("EN", "DE"),
+        "en_fr": ("EN", "FR"),
     }
+    sources = {name: {} for name in pairs}
+    store = TranslationStore(output_dir / ".deepl_cache.sqlite")
+    caches = {name: store.load(source, target) for name, (source, target) in pairs.items()}
 
-    with input_path.open(newline="", encoding="utf-8") as handle, \
-        output_paths["dutch_russian"].open("w", newline="", encoding="utf-8") as dutch_ru, \
-        output_paths["english_russian"].open("w", newline="", encoding="utf-8") as english_ru, \
-        output_paths["spanish_english"].open("w", newline="", encoding="utf-8") as spanish_en, \
-        output_paths["spanish_russian"].open("w", newline="", encoding="utf-8") as spanish_ru, \
-        output_paths["german_english"].open("w", newline="", encoding="utf-8") as german_en, \
-        output_paths["german_russian"].open("w", newline="", encoding="utf-8") as german_ru, \
-        output_paths["french_english"].open("w", newline="", encoding="utf-8") as french_en, \
-        output_paths["french_russian"].open("w", newline="", encoding="utf-8") as french_ru:
-        reader = csv.reader(handle)
-        dutch_ru_writer = csv.writer(dutch_ru)
-        english_ru_writer = csv.writer(english_ru)
-        spanish_en_writer = csv.writer(spanish_en)
-        spanish_ru_writer = csv.writer(spanish_ru)
-        german_en_writer = csv.writer(german_en)
-        german_ru_writer = csv.writer(german_ru)
-        french_en_writer = csv.writer(french_en)
-        french_ru_writer = csv.writer(french_ru)
-
-        for idx, row in enumerate(reader, start=1):
-            if len(row) < 2:
-                continue
-            dutch = row[0].strip()
-            english = row[1].strip()
-            if not dutch or not english:
-                continue
+    for dutch, english in read_pairs(input_path):
+        sources["nl_ru"].setdefault(cache_key(dutch), dutch)
+        english_key = cache_key(english)
+        for name in ("en_ru", "en_es", "en_de", "en_fr"):
+            sources[name].setdefault(english_key, english)
+
+    # Each language pair owns its cache, so the workers never share a dict.
+    limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(
+                    translate,
+                    sources[name],
+                    source,
+                    target,
+                    caches[name],
+                    store,
+                    args.deepl_key,
+                    args.endpoint,
+                    limiter,
+                )
+                for name, (source, target) in pairs.items()
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        store.close()
+
+    with ExitStack() as stack:
+        handles = {
+            name: stack.enter_context(path.open("w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_BYTES))
+            for name, path in output_paths.items()
+        }
+        writers = {name: csv.writer(handle) for name, handle in handles.items()}
+
+        for dutch, english in read_pairs(input_path):
+            english_key = cache_key(english)
+            russian_from_dutch = caches["nl_ru"][cache_key(dutch)]
+            russian_from_english = caches["en_ru"][english_key]
+            spanish_from_english = caches["en_es"][english_key]
+            german_from_english = caches["en_de"][english_key]
+            french_from_english = caches["en_fr"][english_key]
 
-            russian_from_dutch = translate(dutch, "NL", "RU", caches["nl_ru"], args.deepl_key, args.endpoint)
-            russian_from_english = translate(english, "EN", "RU", caches["en_ru"], args.deepl_key, args.endpoint)
-            spanish_from_english = translate(english, "EN", "ES", caches["en_es"], args.deepl_key, args.endpoint)
-            german_from_english = translate(english, "EN", "DE", caches["en_de"], args.deepl_key, args.endpoint)
-            french_from_english = translate(english, "EN", "FR", caches["en_fr"], args.deepl_key, args.endpoint)
-
-            dutch_ru_writer.writerow([dutch, russian_from_dutch])
-            english_ru_writer.writerow([english, russian_from_english])
-            spanish_en_writer.writerow([spanish_from_english, english])
-            spanish_ru_writer.writerow([spanish_from_english, russian_from_english])
-            german_en_writer.writerow([german_from_english, english])
-            german_ru_writer.writerow([german_from_english, russian_from_english])
-            french_en_writer.writerow([french_from_english, english])
-            french_ru_writer.writerow([french_from_english, russian_from_english])
-
-            if idx % 50 == 0:
-                print(f"translated {idx} rows")
+            writers["dutch_russian"].writerow([dutch, russian_from_dutch])
+            writers["english_russian"].writerow([english, russian_from_english])
+            writers["spanish_english"].writerow([spanish_from_english, english])
+            writers["spanish_russian"].writerow([spanish_from_english, russian_from_english])
+            writers["german_english"].writerow([german_from_english, english])
+            writers["german_russian"].writerow([german_from_english, russian_from_english])
+            writers["french_english"].writerow([french_from_english, english])
+            writers["french_russian"].writerow([french_from_english, russian_from_english])
 
     print("done")
     return 0